@@ -1,40 +1,96 @@
+import hmac
+import json
 import os
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
 import re
+import secrets
+import shlex
+import shutil
+import socket
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 import logging
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QListWidget, QPushButton,
-    QMessageBox, QLabel, QHBoxLayout, QListWidgetItem, QInputDialog
+    QMessageBox, QLabel, QHBoxLayout, QListWidgetItem, QInputDialog, QLineEdit,
+    QStyledItemDelegate
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QBrush, QColor, QFont
-from PyQt5.QtWidgets import QLineEdit
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor, QFont, QPalette
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
 log_file = os.path.join(script_dir, 'os_boot_selector.log')
 
-logging.basicConfig(
-    filename=log_file,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+logger = logging.getLogger(__name__)
 
 GRUB_CFG_PATH = "/boot/grub/grub.cfg"
+GRUB_ENV_PATH = "/boot/grub/grubenv"
+_MENUENTRY_RE = re.compile(r"menuentry '([^']+)'")
+_BOOTNUM_RE = re.compile(r'^Boot([0-9A-Fa-f]{4})\*?\s+(.+)$', re.M)
+_BOOTORDER_RE = re.compile(r'^BootOrder:\s*(\S+)', re.M)
+# Seconds a scanned BootOrder may be reused before it is read again
+BOOT_ORDER_MAX_AGE = 30
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "boot-manager", "entries.json")
+GREEN = QBrush(QColor("green"))
+DEFAULT_ROLE = Qt.UserRole + 1
+# The firmware mode cannot change while the app is running
+IS_UEFI = os.path.exists("/sys/firmware/efi")
 sudo_password = None
+askpass = None
+efivarfs_mounted = False
+
+# Seconds the askpass helper may take to send its token or print the password
+ASKPASS_TIMEOUT = 5
+ASKPASS_HELPER = """#!{python}
+import socket
+import sys
+
+sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+sock.connect({socket_path!r})
+sock.sendall({token!r} + b"\\n")
+data = b""
+while True:
+    chunk = sock.recv(4096)
+    if not chunk:
+        break
+    data += chunk
+sys.stdout.write(data.decode())
+"""
 
 
 def is_uefi_mode():
-    return os.path.exists("/sys/firmware/efi")
+    return IS_UEFI
 
 
-def is_efivarfs_mounted():
+def is_efivarfs_mounted(refresh=False):
+    # A positive result is cached; pass refresh=True to check the mounts again
+    global efivarfs_mounted
+    if efivarfs_mounted and not refresh:
+        return True
+    efivarfs_mounted = False
     try:
-        output = subprocess.check_output(['mount']).decode()
-        return 'efivarfs on /sys/firmware/efi/efivars' in output
+        with open('/proc/self/mounts', 'r') as mounts:
+            for line in mounts:
+                fields = line.split()
+                if fields[1:3] == ['/sys/firmware/efi/efivars', 'efivarfs']:
+                    efivarfs_mounted = True
+                    break
     except Exception as e:
-        logging.error(f"Failed to check efivarfs mount: {e}")
+        logger.error("Failed to check efivarfs mount: %s", e)
+    return efivarfs_mounted
+
+
+def _efivars_writable():
+    # efibootmgr cannot succeed on a read-only or empty efivarfs. The mount is
+    # root-owned, so check the mount flags rather than os.access for this user.
+    path = '/sys/firmware/efi/efivars'
+    try:
+        return not os.statvfs(path).f_flag & os.ST_RDONLY and bool(os.listdir(path))
+    except OSError as e:
+        logger.error("Failed to inspect %s: %s", path, e)
         return False
 
 
@@ -42,72 +98,314 @@ def get_grub_entries():
     entries = []
     try:
         with open(GRUB_CFG_PATH, 'r') as file:
-            for line in file:
-                match = re.search(r"menuentry '([^']+)'", line)
-                if match:
-                    entries.append(match.group(1))
-        logging.info(f"Successfully fetched {len(entries)} GRUB entries.")
+            data = file.read()
+        entries = _MENUENTRY_RE.findall(data)
+        logger.info("Successfully fetched %s GRUB entries.", len(entries))
     except Exception as e:
-        logging.error(f"Error reading grub.cfg: {e}")
+        logger.error("Error reading grub.cfg: %s", e)
     return entries
 
 
+def parse_boot_order(output):
+    match = _BOOTORDER_RE.search(output)
+    return match.group(1).split(",") if match else []
+
+
 def get_uefi_entries():
+    # Returns the boot entries and the current BootOrder from one efibootmgr run
     entries = []
+    boot_order = []
     try:
         result = subprocess.run(['efibootmgr', '-v'], capture_output=True, text=True)
-        for line in result.stdout.splitlines():
-            match = re.search(r'Boot([0-9A-Fa-f]{4})\*?\s+(.+)', line)
-            if match:
-                bootnum = match.group(1)
-                name = match.group(2).strip()
-                entries.append((bootnum, name))
-        logging.info(f"Successfully fetched {len(entries)} UEFI entries.")
+        entries = [(m.group(1), m.group(2).strip()) for m in _BOOTNUM_RE.finditer(result.stdout)]
+        boot_order = parse_boot_order(result.stdout)
+        logger.info("Successfully fetched %s UEFI entries.", len(entries))
     except FileNotFoundError:
-        logging.error("efibootmgr not found.")
+        logger.error("efibootmgr not found.")
     except Exception as e:
-        logging.error(f"Error reading UEFI boot entries: {e}")
-    return entries
+        logger.error("Error reading UEFI boot entries: %s", e)
+    return entries, boot_order
+
+
+def get_uefi_boot_order():
+    try:
+        result = subprocess.run(['efibootmgr'], capture_output=True, text=True)
+        return parse_boot_order(result.stdout)
+    except Exception as e:
+        logger.error("Error reading UEFI boot order: %s", e)
+        return []
 
 
 def get_default_entry():
+    # Read the GRUB environment block directly instead of spawning grub-editenv
     try:
-        result = subprocess.run(['grub-editenv', 'list'], capture_output=True, text=True)
-        for line in result.stdout.splitlines():
-            if line.startswith("saved_entry="):
-                logging.info(f"Default GRUB entry found: {line.split('=')[1]}")
-                return line.split("=")[1]
+        with open(GRUB_ENV_PATH, 'r') as file:
+            for line in file:
+                if line.startswith("saved_entry="):
+                    saved_entry = line.rstrip('\n').split("=", 1)[1]
+                    logger.info("Default GRUB entry found: %s", saved_entry)
+                    return saved_entry
     except Exception as e:
-        logging.error(f"Could not read default GRUB entry: {e}")
+        logger.error("Could not read default GRUB entry: %s", e)
     return None
 
 
-def run_sudo_command(command_list, password):
+def get_entries_cache_key():
+    # The cached GRUB entries stay valid as long as grub.cfg and grubenv are unchanged
+    key = []
+    for path in (GRUB_CFG_PATH, GRUB_ENV_PATH):
+        try:
+            key.append(os.stat(path).st_mtime)
+        except OSError:
+            key.append(None)
+    return key
+
+
+def load_entries_cache():
+    try:
+        with open(CACHE_FILE, 'r') as file:
+            cache = json.load(file)
+        return cache['key'], cache['grub'], cache['uefi'], cache['default']
+    except FileNotFoundError:
+        logger.info("No boot entry cache found.")
+    except Exception as e:
+        logger.error("Could not read boot entry cache: %s", e)
+    return None
+
+
+def save_entries_cache(key, grub_entries, uefi_entries, default_entry):
     try:
-        proc = subprocess.run(
-            ['sudo', '-S'] + command_list,
-            input=password + '\n',
-            capture_output=True,
-            text=True
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, 'w') as file:
+            json.dump({
+                'key': key,
+                'grub': grub_entries,
+                'uefi': uefi_entries,
+                'default': default_entry,
+            }, file)
+    except Exception as e:
+        logger.error("Could not write boot entry cache: %s", e)
+
+
+def scan_entries():
+    # Take the cache key before scanning so a change mid-scan is picked up next start
+    key = get_entries_cache_key()
+    # The three reads are independent file/subprocess I/O, so overlap them
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        fut_grub = executor.submit(get_grub_entries)
+        fut_uefi = executor.submit(get_uefi_entries)
+        fut_default = executor.submit(get_default_entry)
+    grub_entries = fut_grub.result()
+    uefi_entries, boot_order = fut_uefi.result()
+    default_entry = fut_default.result()
+    # BootOrder is not covered by the cache key, so it is kept in memory only
+    save_entries_cache(key, grub_entries, uefi_entries, default_entry)
+    return grub_entries, uefi_entries, default_entry, boot_order
+
+
+class AskpassServer:
+    # Hands the verified password to a SUDO_ASKPASS helper over a UNIX socket,
+    # so it never has to be written to disk or piped to every sudo call. The
+    # helper and socket live in a private 0700 directory and the helper must
+    # present a random token before the password is sent.
+    def __init__(self, password):
+        self.password = password
+        self.token = secrets.token_hex(16)
+        self.directory = tempfile.mkdtemp(prefix='boot-manager-')
+        self.socket_path = os.path.join(self.directory, 'askpass.sock')
+        self.helper_path = os.path.join(self.directory, 'askpass')
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.bind(self.socket_path)
+            self.sock.listen(1)
+            with open(self.helper_path, 'w') as file:
+                file.write(ASKPASS_HELPER.format(
+                    python=sys.executable,
+                    socket_path=self.socket_path,
+                    token=self.token.encode(),
+                ))
+            os.chmod(self.helper_path, 0o700)
+        except OSError:
+            self.close()
+            raise
+        self.env = dict(os.environ, SUDO_ASKPASS=self.helper_path)
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # socket closed
+            with conn:
+                # A client that never sends its token must not block later requests
+                conn.settimeout(ASKPASS_TIMEOUT)
+                try:
+                    token = conn.recv(64).strip()
+                    if hmac.compare_digest(token, self.token.encode()):
+                        conn.sendall(self.password.encode() + b'\n')
+                    else:
+                        logger.error("Rejected askpass request with a bad token.")
+                except OSError as e:
+                    logger.error("Askpass request failed: %s", e)
+
+    def close(self):
+        try:
+            # Wakes the blocking accept() in serve()
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def start_askpass(password):
+    global askpass
+    try:
+        server = AskpassServer(password)
+    except OSError as e:
+        logger.error("Could not start askpass helper, falling back to sudo -S: %s", e)
+        return
+    # Run the helper once, the way sudo will; it may not be executable at all,
+    # e.g. on a noexec /tmp or in a frozen build without a usable interpreter.
+    try:
+        result = subprocess.run(
+            [server.helper_path], capture_output=True, text=True, timeout=ASKPASS_TIMEOUT
         )
+        works = result.returncode == 0 and result.stdout == password + '\n'
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.error("Askpass helper could not be run: %s", e)
+        works = False
+    if works:
+        askpass = server
+    else:
+        logger.error("Askpass helper self-test failed, falling back to sudo -S.")
+        server.close()
+
+
+def verify_sudo_password(password):
+    # 'sudo -v' skips reading stdin while a timestamp is still valid, which would
+    # accept any typo, so drop the timestamp first to force a real check. The
+    # successful -v then refreshes the credential cache without running a command.
+    subprocess.run(['sudo', '-k'])
+    return run_sudo_command(['-v'], password)
+
+
+def is_grub_index(index):
+    # GRUB keys are menu positions; UEFI keys are always four hex digits (Boot####)
+    return index.isdigit() and len(index) < 4
+
+
+def run_sudo_command(command_list, password):
+    # command_list may also be bare sudo flags, e.g. ['-v'] to only validate.
+    # Once the askpass helper is running, sudo fetches the password from it
+    # (only if its timestamp has expired); otherwise the password is piped in.
+    global askpass
+    try:
+        proc = None
+        if askpass:
+            proc = subprocess.run(
+                ['sudo', '-A'] + command_list,
+                capture_output=True,
+                text=True,
+                env=askpass.env
+            )
+            # Errors from sudo itself (rather than the command) are prefixed
+            # 'sudo:'; stop using the helper and retry with the known password.
+            if proc.returncode != 0 and any(
+                line.startswith('sudo:') for line in proc.stderr.splitlines()
+            ):
+                logger.error("sudo -A failed, falling back to sudo -S: %s", proc.stderr.strip())
+                askpass.close()
+                askpass = None
+                proc = None
+        if proc is None:
+            proc = subprocess.run(
+                ['sudo', '-S'] + command_list,
+                input=password + '\n',
+                capture_output=True,
+                text=True
+            )
         if proc.returncode != 0:
             error_msg = f"Command failed: {' '.join(command_list)}\n{proc.stderr.strip()}"
-            logging.error(error_msg)
+            logger.error(error_msg)
             return False, error_msg
-        logging.info(f"Successfully executed: {' '.join(command_list)}")
+        logger.info("Successfully executed: %s", command_list)
         return True, None
     except subprocess.CalledProcessError as e:
         error_msg = f"Sudo command failed: {e.stderr}"
-        logging.error(error_msg)
+        logger.error(error_msg)
         return False, error_msg
 
 
+def run_sudo_shell(script, password):
+    # Run a whole shell script under a single sudo invocation, so chained
+    # commands share one authentication and stop at the first failure.
+    return run_sudo_command(['sh', '-c', script], password)
+
+
+def set_uefi_default(bootnum, password, current_order=None):
+    # Reuse the BootOrder read at startup and only re-read it if applying that fails
+    if current_order:
+        new_order = [bootnum] + [x for x in current_order if x != bootnum]
+        success, err = run_sudo_command(['efibootmgr', '--bootorder', ','.join(new_order)], password)
+        if success:
+            return success, err
+        logger.info("Retrying with a freshly read BootOrder.")
+
+    current_order = get_uefi_boot_order()
+    new_order = [bootnum] + [x for x in current_order if x != bootnum]
+    return run_sudo_command(['efibootmgr', '--bootorder', ','.join(new_order)], password)
+
+
+class SudoWorker(QThread):
+    # Runs a blocking (success, error) helper such as run_sudo_command off the GUI thread
+    result_ready = pyqtSignal(bool, str)
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+
+    def run(self):
+        try:
+            success, err = self.func(*self.args)
+        except Exception as e:
+            logger.error("Background command failed: %s", e)
+            success, err = False, str(e)
+        self.result_ready.emit(success, err or "")
+
+
+class EntryScanWorker(QThread):
+    entries_ready = pyqtSignal(list, list, object, list)
+
+    def run(self):
+        grub_entries, uefi_entries, default_entry, boot_order = scan_entries()
+        self.entries_ready.emit(grub_entries, uefi_entries, default_entry, boot_order)
+
+
+class DefaultEntryDelegate(QStyledItemDelegate):
+    # Decorates the default entry at paint time, so the item's text and
+    # styling never have to be mutated to mark it.
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        if index.data(DEFAULT_ROLE):
+            option.text += "  ✅ (default)"
+            font = QFont(option.font)
+            font.setBold(True)
+            option.font = font
+            option.palette.setBrush(QPalette.Text, GREEN)
+
+
 class OSBootSelector(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Boot Manager")
         self.setMinimumSize(500, 300)
-        self.entry_map = {}
+        self.workers = set()
+        self._boot_order = None
+        self._boot_order_time = 0.0
+        self.scan_worker = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -117,87 +415,164 @@ class OSBootSelector(QWidget):
 
         self.list_widget = QListWidget()
         self.list_widget.setSelectionMode(QListWidget.SingleSelection)
+        self.list_widget.setItemDelegate(DefaultEntryDelegate(self.list_widget))
 
-        grub_entries = get_grub_entries()
-        uefi_entries = get_uefi_entries()
-        all_entries = []
-
-        for bootnum, name in uefi_entries:
-            display = f"{name} (Boot{bootnum})"
-            self.entry_map[display] = bootnum
-            all_entries.append(display)
-
-        for i, name in enumerate(grub_entries):
-            display = f"{name} (GRUB{i})"
-            self.entry_map[display] = str(i)
-            all_entries.append(display)
-
-        default_entry = get_default_entry()
-
-        for entry in all_entries:
-            key = self.entry_map[entry]
-            item = QListWidgetItem(entry)
-            if default_entry == key:
-                item.setText(item.text() + "  ✅ (default)")
-                item.setForeground(QBrush(QColor("green")))
-                font = QFont()
-                font.setBold(True)
-                item.setFont(font)
-            self.list_widget.addItem(item)
+        # Paint from the on-disk cache while grub.cfg and grubenv are unchanged.
+        # The key does not cover UEFI entries, so always rescan in the background.
+        cache = load_entries_cache()
+        if cache:
+            cached_key, grub_entries, uefi_entries, default_entry = cache
+            if cached_key == get_entries_cache_key():
+                self.populate_list(grub_entries, uefi_entries, default_entry)
+        self.start_scan()
 
         sidebar_layout.addWidget(QLabel("Installed Operating Systems:"))
         sidebar_layout.addWidget(self.list_widget)
 
-        reboot_btn = QPushButton("Reboot into Selected OS")
-        reboot_btn.clicked.connect(self.reboot_selected)
+        self.reboot_btn = QPushButton("Reboot into Selected OS")
+        self.reboot_btn.clicked.connect(self.reboot_selected)
 
-        default_btn = QPushButton("Set as Default OS")
-        default_btn.clicked.connect(self.set_default_os)
+        self.default_btn = QPushButton("Set as Default OS")
+        self.default_btn.clicked.connect(self.set_default_os)
 
-        control_layout.addWidget(reboot_btn)
-        control_layout.addWidget(default_btn)
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+
+        control_layout.addWidget(self.reboot_btn)
+        control_layout.addWidget(self.default_btn)
+        control_layout.addWidget(refresh_btn)
         control_layout.addStretch()
 
         main_layout.addLayout(sidebar_layout, 2)
         main_layout.addLayout(control_layout, 1)
         self.setLayout(main_layout)
 
+    def start_scan(self):
+        if self.scan_worker and self.scan_worker.isRunning():
+            return
+        self.scan_worker = EntryScanWorker()
+        self.scan_worker.entries_ready.connect(self.on_entries_scanned)
+        self.scan_worker.start()
+
+    def refresh(self):
+        is_efivarfs_mounted(refresh=True)
+        self.start_scan()
+
+    def on_entries_scanned(self, grub_entries, uefi_entries, default_entry, boot_order):
+        self._boot_order = boot_order
+        self._boot_order_time = time.monotonic()
+        self.populate_list(grub_entries, uefi_entries, default_entry)
+
+    def fresh_boot_order(self):
+        # Only reuse the scanned BootOrder shortly after the scan; writing back an
+        # older copy would drop any entry created since then.
+        if time.monotonic() - self._boot_order_time > BOOT_ORDER_MAX_AGE:
+            return None
+        return self._boot_order
+
+    def populate_list(self, grub_entries, uefi_entries, default_entry):
+        # Remember the selection so a background rescan does not drop it
+        selected_items = self.list_widget.selectedItems()
+        selected_key = selected_items[0].data(Qt.UserRole) if selected_items else None
+
+        # Suspend repaints while the whole list is rebuilt
+        self.list_widget.setUpdatesEnabled(False)
+        self.list_widget.clear()
+
+        for bootnum, name in uefi_entries:
+            self.add_entry(f"{name} (Boot{bootnum})", bootnum, default_entry == bootnum)
+
+        for i, name in enumerate(grub_entries):
+            key = str(i)
+            self.add_entry(f"{name} (GRUB{i})", key, default_entry == key)
+
+        if selected_key is not None:
+            for row in range(self.list_widget.count()):
+                item = self.list_widget.item(row)
+                if item.data(Qt.UserRole) == selected_key:
+                    self.list_widget.setCurrentItem(item)
+                    break
+
+        self.list_widget.setUpdatesEnabled(True)
+
+    def add_entry(self, display, key, is_default):
+        item = QListWidgetItem(display)
+        # Keep the boot key on the item itself rather than parsing it back from the text
+        item.setData(Qt.UserRole, key)
+        # DefaultEntryDelegate draws the default marker from this flag
+        item.setData(DEFAULT_ROLE, is_default)
+        self.list_widget.addItem(item)
+
     def get_selected_index(self):
         selected_items = self.list_widget.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "No selection", "Please select an OS.")
             return None
-        raw_text = selected_items[0].text().replace("  ✅ (default)", "").strip()
-        return self.entry_map.get(raw_text)
+        return selected_items[0].data(Qt.UserRole)
+
+    def closeEvent(self, event):
+        # Destroying a QThread that is still running aborts the process
+        for worker in list(self.workers):
+            worker.wait()
+        if self.scan_worker:
+            self.scan_worker.wait()
+        super().closeEvent(event)
+
+    def set_busy(self, busy):
+        self.reboot_btn.setEnabled(not busy)
+        self.default_btn.setEnabled(not busy)
+
+    def run_in_background(self, on_done, func, *args):
+        # Run func(*args) in a SudoWorker and call on_done(success, err) on the GUI thread
+        worker = SudoWorker(func, *args)
+        worker.result_ready.connect(lambda *_: self.set_busy(False))
+        worker.result_ready.connect(on_done)
+        # Keep a reference until the thread has fully stopped
+        worker.finished.connect(lambda: self.workers.discard(worker))
+        self.workers.add(worker)
+        self.set_busy(True)
+        worker.start()
+
+    def prompt_for_password(self, on_password):
+        # Calls on_password with a verified password once sudo has accepted it
+        if sudo_password:
+            on_password(sudo_password)
+            return
 
-    def prompt_for_password(self):
-        global sudo_password
-        while True:
-            if sudo_password:
-                return sudo_password
-            password, ok = QInputDialog.getText(self, "Sudo Password Required", "Enter your sudo password:", echo=QLineEdit.Password)
-            if ok:
-                success, _ = run_sudo_command(['echo', 'verified'], password)
-                if success:
-                    sudo_password = password
-                    return password
-                else:
-                    QMessageBox.critical(self, "Authentication Failed", "Incorrect password. Try again.")
+        password, ok = QInputDialog.getText(self, "Sudo Password Required", "Enter your sudo password:", echo=QLineEdit.Password)
+        if not ok:
+            return
+
+        def on_verified(success, _):
+            global sudo_password
+            if success:
+                sudo_password = password
+                start_askpass(password)
+                on_password(password)
             else:
-                return None
+                QMessageBox.critical(self, "Authentication Failed", "Incorrect password. Try again.")
+                self.prompt_for_password(on_password)
+
+        self.run_in_background(on_verified, verify_sudo_password, password)
 
     def reboot_selected(self):
         index = self.get_selected_index()
         if not index:
             return
 
-        if not is_uefi_mode():
-            QMessageBox.critical(self, "Error", "System is not in UEFI mode.")
-            return
+        grub = is_grub_index(index)
+        if not grub:
+            if not is_uefi_mode():
+                QMessageBox.critical(self, "Error", "System is not in UEFI mode.")
+                return
 
-        if not is_efivarfs_mounted():
-            QMessageBox.critical(self, "Error", "EFI variables are not accessible. Ensure efivarfs is mounted.")
-            return
+            if not is_efivarfs_mounted():
+                QMessageBox.critical(self, "Error", "EFI variables are not accessible. Ensure efivarfs is mounted.")
+                return
+
+            if not _efivars_writable():
+                QMessageBox.critical(self, "Error", "EFI variables are read-only or empty. Cannot set a one-time boot entry.")
+                return
 
         confirm = QMessageBox.question(
             self, "Confirm Reboot",
@@ -207,59 +582,70 @@ class OSBootSelector(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        password = self.prompt_for_password()
-        if not password:
-            return
-
-        if index.isdigit():  # GRUB
-            success, err = run_sudo_command(['efibootmgr', '-n', index], password)
-        else:  # UEFI
-            success, err = run_sudo_command(['efibootmgr', '-n', index], password)
+        cmd = ['grub-reboot', index] if grub else ['efibootmgr', '-n', index]
+        script = f"{shlex.join(cmd)} && reboot"
 
-        if success:
-            success2, err2 = run_sudo_command(['reboot'], password)
-            if success2:
+        def on_done(success, err):
+            if success:
                 QMessageBox.information(self, "Rebooting", "System is rebooting now...")
             else:
-                QMessageBox.critical(self, "Reboot Failed", f"Failed to reboot.\n{err2}")
-        else:
-            QMessageBox.critical(self, "BootNext Failed", f"Failed to set one-time boot.\n{err}")
+                QMessageBox.critical(self, "Reboot Failed", f"Failed to set one-time boot and reboot.\n{err}")
+
+        self.prompt_for_password(
+            lambda password: self.run_in_background(on_done, run_sudo_shell, script, password)
+        )
 
     def set_default_os(self):
         index = self.get_selected_index()
         if not index:
             return
 
-        password = self.prompt_for_password()
-        if not password:
-            return
+        if is_grub_index(index):  # GRUB
+            def on_done(success, err):
+                if success:
+                    QMessageBox.information(self, "Success", f"Set GRUB entry #{index} as default.")
+                else:
+                    QMessageBox.critical(self, "Error", f"Failed to set GRUB default.\n{err}")
 
-        if index.isdigit():  # GRUB
-            success, err = run_sudo_command(['grub-set-default', index], password)
-            if success:
-                QMessageBox.information(self, "Success", f"Set GRUB entry #{index} as default.")
-            else:
-                QMessageBox.critical(self, "Error", f"Failed to set GRUB default.\n{err}")
+            self.prompt_for_password(
+                lambda password: self.run_in_background(
+                    on_done, run_sudo_command, ['grub-set-default', index], password
+                )
+            )
         else:  # UEFI
-            # Get full current boot order
-            result = subprocess.run(['efibootmgr'], capture_output=True, text=True)
-            current_order = []
-            for line in result.stdout.splitlines():
-                if line.startswith("BootOrder:"):
-                    current_order = line.split(":")[1].strip().split(",")
-                    break
-            new_order = [index] + [x for x in current_order if x != index]
+            if not _efivars_writable():
+                QMessageBox.critical(self, "Error", "EFI variables are read-only or empty. Cannot change the boot order.")
+                return
 
-            success, err = run_sudo_command(['efibootmgr', '--bootorder'] + new_order, password)
-            if success:
-                QMessageBox.information(self, "Success", f"Set Boot{index} as default UEFI boot option.")
-            else:
-                QMessageBox.critical(self, "Error", f"Failed to set UEFI boot order.\n{err}")
+            def on_done(success, err):
+                if success:
+                    # The firmware now holds the authoritative order; read it again next time
+                    self._boot_order = None
+                    QMessageBox.information(self, "Success", f"Set Boot{index} as default UEFI boot option.")
+                else:
+                    QMessageBox.critical(self, "Error", f"Failed to set UEFI boot order.\n{err}")
+
+            self.prompt_for_password(
+                lambda password: self.run_in_background(
+                    on_done, set_uefi_default, index, password, self.fresh_boot_order()
+                )
+            )
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    # Configured here so importing the module has no side effects; delay=True
+    # only opens the log file once the first record is written.
+    log_handler = logging.FileHandler(log_file, delay=True)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logging.basicConfig(level=logging.DEBUG, handlers=[log_handler])
     window = OSBootSelector()
     window.show()
-    logging.info("Boot Manager application started.")
-    sys.exit(app.exec_())
+    logger.info("Boot Manager application started.")
+    exit_code = app.exec_()
+    if askpass:
+        askpass.close()
+    if sudo_password:
+        # Drop the cached sudo timestamp so it does not outlive the app
+        subprocess.run(['sudo', '-k'])
+    sys.exit(exit_code)
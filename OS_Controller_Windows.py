@@ -1,68 +1,126 @@
+import ctypes
+import json
 import os
+import re
 import subprocess
 import sys
 import logging
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QListWidget, QPushButton,
-    QMessageBox, QLabel, QHBoxLayout, QListWidgetItem, QInputDialog
+    QMessageBox, QLabel, QHBoxLayout, QListWidgetItem, QInputDialog, QLineEdit,
+    QStyledItemDelegate
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QBrush, QColor, QFont
-from PyQt5.QtWidgets import QLineEdit
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor, QFont, QPalette
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
 log_file = os.path.join(script_dir, 'windows_boot_selector.log')
 
-logging.basicConfig(
-    filename=log_file,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+logger = logging.getLogger(__name__)
 
 BCDEDIT_CMD = "bcdedit"
+FIRMWARE_TYPE_UEFI = 2
+_ENTRY_FIELD_RE = re.compile(r'^\s*(identifier|description)\s+(.+)$', re.M | re.I)
+_DEF_RE = re.compile(r'^\s*default\s+(\{[^}]+\})', re.M | re.I)
+CACHE_FILE = os.path.join(
+    os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "boot-manager", "entries.json"
+)
 
+GREEN = QBrush(QColor("green"))
+DEFAULT_ROLE = Qt.UserRole + 1
 sudo_password = None
 
 
 def is_uefi_mode():
-    # On Windows, UEFI mode can be checked using the existence of certain directories
-    # such as the Windows EFI system partition.
+    # Ask the firmware directly via GetFirmwareType (Windows 8+)
+    try:
+        firmware_type = ctypes.c_uint(0)
+        if ctypes.windll.kernel32.GetFirmwareType(ctypes.byref(firmware_type)):
+            return firmware_type.value == FIRMWARE_TYPE_UEFI
+    except Exception as e:
+        logger.error("GetFirmwareType failed: %s", e)
+    # Fall back to the existence of the Windows EFI boot directory
     return os.path.exists("C:\\Windows\\Boot\\EFI")
 
 
-def get_bcd_entries():
-    # Fetch all boot entries from BCDEdit
+_BCD_CACHE = {'entries': [], 'default': None}
+_bcd_loaded = False
+
+
+def _bcd_snapshot():
+    # Run BCDEdit once and parse both the boot entries and the default entry
+    # from the same output, so the UI does not spawn bcdedit twice.
+    global _bcd_loaded
     entries = []
+    default = None
     try:
-        result = subprocess.run([BCDEDIT_CMD], capture_output=True, text=True)
-        for line in result.stdout.splitlines():
-            if "description" in line.lower():
-                # Extract the description (boot entry name)
-                match = line.strip().split(":")
-                if len(match) > 1:
-                    name = match[1].strip()
-                    entries.append(name)
-        logging.info(f"Successfully fetched {len(entries)} boot entries.")
+        result = subprocess.run([BCDEDIT_CMD, '/enum'], capture_output=True, text=True)
+        # Pair each description with the identifier of the entry it belongs to;
+        # bcdedit only accepts identifiers for /bootsequence and /default.
+        identifier = None
+        for field, value in _ENTRY_FIELD_RE.findall(result.stdout):
+            value = value.strip()
+            if field.lower() == 'identifier':
+                identifier = value
+            elif identifier and identifier.lower() != '{bootmgr}':
+                entries.append((identifier, value))
+                identifier = None
+        # Identifier of the default entry, e.g. {current} or a GUID
+        match = _DEF_RE.search(result.stdout)
+        if match:
+            default = match.group(1)
+        logger.info("Successfully fetched %s boot entries.", len(entries))
     except Exception as e:
-        logging.error(f"Error reading BCDEDIT entries: {e}")
-    return entries
+        logger.error("Error reading BCDEDIT entries: %s", e)
+    _BCD_CACHE['entries'] = entries
+    _BCD_CACHE['default'] = default
+    _bcd_loaded = True
+    return _BCD_CACHE
+
+
+def get_bcd_entries():
+    # Fetch all boot entries from the cached BCDEdit snapshot
+    if not _bcd_loaded:
+        _bcd_snapshot()
+    return _BCD_CACHE['entries']
 
 
 def get_default_entry():
-    # Retrieve the default boot entry
+    # Retrieve the default boot entry from the cached BCDEdit snapshot
+    if not _bcd_loaded:
+        _bcd_snapshot()
+    return _BCD_CACHE['default']
+
+
+def load_entries_cache():
     try:
-        result = subprocess.run([BCDEDIT_CMD], capture_output=True, text=True)
-        for line in result.stdout.splitlines():
-            if "default" in line.lower():
-                # Extract the GUID of the default entry
-                match = line.strip().split(":")
-                if len(match) > 1:
-                    return match[1].strip()
+        with open(CACHE_FILE, 'r') as file:
+            cache = json.load(file)
+        return cache['boot_entries'], cache['default']
+    except FileNotFoundError:
+        logger.info("No boot entry cache found.")
     except Exception as e:
-        logging.error(f"Could not read default boot entry: {e}")
+        logger.error("Could not read boot entry cache: %s", e)
     return None
 
 
+def save_entries_cache(boot_entries, default_entry):
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, 'w') as file:
+            json.dump({'boot_entries': boot_entries, 'default': default_entry}, file)
+    except Exception as e:
+        logger.error("Could not write boot entry cache: %s", e)
+
+
+def scan_entries():
+    _bcd_snapshot()
+    boot_entries = get_bcd_entries()
+    default_entry = get_default_entry()
+    save_entries_cache(boot_entries, default_entry)
+    return boot_entries, default_entry
+
+
 def run_sudo_command(command_list, password):
     try:
         proc = subprocess.run(
@@ -72,22 +130,67 @@ def run_sudo_command(command_list, password):
         )
         if proc.returncode != 0:
             error_msg = f"Command failed: {' '.join(command_list)}\n{proc.stderr.strip()}"
-            logging.error(error_msg)
+            logger.error(error_msg)
             return False, error_msg
-        logging.info(f"Successfully executed: {' '.join(command_list)}")
+        logger.info("Successfully executed: %s", command_list)
         return True, None
     except subprocess.CalledProcessError as e:
         error_msg = f"Sudo command failed: {e.stderr}"
-        logging.error(error_msg)
+        logger.error(error_msg)
         return False, error_msg
 
 
+def run_sudo_shell(script, password):
+    # Run a whole cmd script under a single elevated invocation, so chained
+    # commands share one elevation and stop at the first failure.
+    return run_sudo_command(['cmd', '/c', script], password)
+
+
+class SudoWorker(QThread):
+    # Runs a blocking (success, error) helper such as run_sudo_command off the GUI thread
+    result_ready = pyqtSignal(bool, str)
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+
+    def run(self):
+        try:
+            success, err = self.func(*self.args)
+        except Exception as e:
+            logger.error("Background command failed: %s", e)
+            success, err = False, str(e)
+        self.result_ready.emit(success, err or "")
+
+
+class EntryScanWorker(QThread):
+    entries_ready = pyqtSignal(list, object)
+
+    def run(self):
+        boot_entries, default_entry = scan_entries()
+        self.entries_ready.emit(boot_entries, default_entry)
+
+
+class DefaultEntryDelegate(QStyledItemDelegate):
+    # Decorates the default entry at paint time, so the item's text and
+    # styling never have to be mutated to mark it.
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        if index.data(DEFAULT_ROLE):
+            option.text += "  ✅ (default)"
+            font = QFont(option.font)
+            font.setBold(True)
+            option.font = font
+            option.palette.setBrush(QPalette.Text, GREEN)
+
+
 class OSBootSelector(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Boot Manager")
         self.setMinimumSize(500, 300)
-        self.entry_map = {}
+        self.workers = set()
         self.setup_ui()
 
     def setup_ui(self):
@@ -97,68 +200,113 @@ class OSBootSelector(QWidget):
 
         self.list_widget = QListWidget()
         self.list_widget.setSelectionMode(QListWidget.SingleSelection)
+        self.list_widget.setItemDelegate(DefaultEntryDelegate(self.list_widget))
 
-        boot_entries = get_bcd_entries()
-        all_entries = []
-
-        for i, name in enumerate(boot_entries):
-            display = f"{name} (Boot{i})"
-            self.entry_map[display] = name
-            all_entries.append(display)
-
-        default_entry = get_default_entry()
-
-        for entry in all_entries:
-            key = self.entry_map[entry]
-            item = QListWidgetItem(entry)
-            if default_entry == key:
-                item.setText(item.text() + "  ✅ (default)")
-                item.setForeground(QBrush(QColor("green")))
-                font = QFont()
-                font.setBold(True)
-                item.setFont(font)
-            self.list_widget.addItem(item)
+        # Paint from the on-disk cache right away; the BCD store has no cheap
+        # change marker, so always rescan in the background and repaint.
+        cache = load_entries_cache()
+        if cache:
+            self.populate_list(*cache)
+        self.scan_worker = EntryScanWorker()
+        self.scan_worker.entries_ready.connect(self.populate_list)
+        self.scan_worker.start()
 
         sidebar_layout.addWidget(QLabel("Installed Operating Systems:"))
         sidebar_layout.addWidget(self.list_widget)
 
-        reboot_btn = QPushButton("Reboot into Selected OS")
-        reboot_btn.clicked.connect(self.reboot_selected)
+        self.reboot_btn = QPushButton("Reboot into Selected OS")
+        self.reboot_btn.clicked.connect(self.reboot_selected)
 
-        default_btn = QPushButton("Set as Default OS")
-        default_btn.clicked.connect(self.set_default_os)
+        self.default_btn = QPushButton("Set as Default OS")
+        self.default_btn.clicked.connect(self.set_default_os)
 
-        control_layout.addWidget(reboot_btn)
-        control_layout.addWidget(default_btn)
+        control_layout.addWidget(self.reboot_btn)
+        control_layout.addWidget(self.default_btn)
         control_layout.addStretch()
 
         main_layout.addLayout(sidebar_layout, 2)
         main_layout.addLayout(control_layout, 1)
         self.setLayout(main_layout)
 
+    def populate_list(self, boot_entries, default_entry):
+        # Remember the selection so a background rescan does not drop it
+        selected_items = self.list_widget.selectedItems()
+        selected_key = selected_items[0].data(Qt.UserRole) if selected_items else None
+
+        # Suspend repaints while the whole list is rebuilt
+        self.list_widget.setUpdatesEnabled(False)
+        self.list_widget.clear()
+
+        for i, (identifier, name) in enumerate(boot_entries):
+            self.add_entry(f"{name} (Boot{i})", identifier, default_entry == identifier)
+
+        if selected_key is not None:
+            for row in range(self.list_widget.count()):
+                item = self.list_widget.item(row)
+                if item.data(Qt.UserRole) == selected_key:
+                    self.list_widget.setCurrentItem(item)
+                    break
+
+        self.list_widget.setUpdatesEnabled(True)
+
+    def add_entry(self, display, key, is_default):
+        item = QListWidgetItem(display)
+        # Keep the boot key on the item itself rather than parsing it back from the text
+        item.setData(Qt.UserRole, key)
+        # DefaultEntryDelegate draws the default marker from this flag
+        item.setData(DEFAULT_ROLE, is_default)
+        self.list_widget.addItem(item)
+
     def get_selected_index(self):
         selected_items = self.list_widget.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "No selection", "Please select an OS.")
             return None
-        raw_text = selected_items[0].text().replace("  ✅ (default)", "").strip()
-        return self.entry_map.get(raw_text)
-
-    def prompt_for_password(self):
-        global sudo_password
-        while True:
-            if sudo_password:
-                return sudo_password
-            password, ok = QInputDialog.getText(self, "Administrator Password Required", "Enter your password:", echo=QLineEdit.Password)
-            if ok:
-                success, _ = run_sudo_command(['echo', 'verified'], password)
-                if success:
-                    sudo_password = password
-                    return password
-                else:
-                    QMessageBox.critical(self, "Authentication Failed", "Incorrect password. Try again.")
+        return selected_items[0].data(Qt.UserRole)
+
+    def closeEvent(self, event):
+        # Destroying a QThread that is still running aborts the process
+        for worker in list(self.workers):
+            worker.wait()
+        if self.scan_worker:
+            self.scan_worker.wait()
+        super().closeEvent(event)
+
+    def set_busy(self, busy):
+        self.reboot_btn.setEnabled(not busy)
+        self.default_btn.setEnabled(not busy)
+
+    def run_in_background(self, on_done, func, *args):
+        # Run func(*args) in a SudoWorker and call on_done(success, err) on the GUI thread
+        worker = SudoWorker(func, *args)
+        worker.result_ready.connect(lambda *_: self.set_busy(False))
+        worker.result_ready.connect(on_done)
+        # Keep a reference until the thread has fully stopped
+        worker.finished.connect(lambda: self.workers.discard(worker))
+        self.workers.add(worker)
+        self.set_busy(True)
+        worker.start()
+
+    def prompt_for_password(self, on_password):
+        # Calls on_password with a verified password once it has been accepted
+        if sudo_password:
+            on_password(sudo_password)
+            return
+
+        password, ok = QInputDialog.getText(self, "Administrator Password Required", "Enter your password:", echo=QLineEdit.Password)
+        if not ok:
+            return
+
+        def on_verified(success, _):
+            global sudo_password
+            if success:
+                sudo_password = password
+                on_password(password)
             else:
-                return None
+                QMessageBox.critical(self, "Authentication Failed", "Incorrect password. Try again.")
+                self.prompt_for_password(on_password)
+
+        self.run_in_background(on_verified, run_sudo_command, ['echo', 'verified'], password)
 
     def reboot_selected(self):
         index = self.get_selected_index()
@@ -173,36 +321,44 @@ class OSBootSelector(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        password = self.prompt_for_password()
-        if not password:
-            return
+        script = f"{subprocess.list2cmdline([BCDEDIT_CMD, '/bootsequence', index])} && shutdown /r /t 0"
 
-        success, err = run_sudo_command(['shutdown', '/r', '/t', '0'], password)
+        def on_done(success, err):
+            if success:
+                QMessageBox.information(self, "Rebooting", "System is rebooting now...")
+            else:
+                QMessageBox.critical(self, "Reboot Failed", f"Failed to set one-time boot and reboot.\n{err}")
 
-        if success:
-            QMessageBox.information(self, "Rebooting", "System is rebooting now...")
-        else:
-            QMessageBox.critical(self, "Reboot Failed", f"Failed to reboot.\n{err}")
+        self.prompt_for_password(
+            lambda password: self.run_in_background(on_done, run_sudo_shell, script, password)
+        )
 
     def set_default_os(self):
         index = self.get_selected_index()
         if not index:
             return
 
-        password = self.prompt_for_password()
-        if not password:
-            return
+        def on_done(success, err):
+            if success:
+                QMessageBox.information(self, "Success", f"Set {index} as default boot entry.")
+            else:
+                QMessageBox.critical(self, "Error", f"Failed to set default boot entry.\n{err}")
 
-        success, err = run_sudo_command([BCDEDIT_CMD, '/default', index], password)
-        if success:
-            QMessageBox.information(self, "Success", f"Set {index} as default boot entry.")
-        else:
-            QMessageBox.critical(self, "Error", f"Failed to set default boot entry.\n{err}")
+        self.prompt_for_password(
+            lambda password: self.run_in_background(
+                on_done, run_sudo_command, [BCDEDIT_CMD, '/default', index], password
+            )
+        )
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    # Configured here so importing the module has no side effects; delay=True
+    # only opens the log file once the first record is written.
+    log_handler = logging.FileHandler(log_file, delay=True)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logging.basicConfig(level=logging.DEBUG, handlers=[log_handler])
     window = OSBootSelector()
     window.show()
-    logging.info("Boot Manager application started.")
+    logger.info("Boot Manager application started.")
     sys.exit(app.exec_())